@@ -1,4 +1,13 @@
 import streamlit as st
+import atexit
+import os
+import hmac
+import hashlib
+import secrets
+import time
+import re
+import queue
+import threading
 import sqlite3
 import pandas as pd
 import bcrypt
@@ -8,27 +17,56 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 
 # =================== DATABASE ===================
-conn = sqlite3.connect("hospital.db")
-c = conn.cursor()
-
-def add_column_if_missing(table, column, col_type):
+@st.cache_resource
+def get_conn():
+    """Opens, tunes and migrates the one SQLite connection shared by every session."""
+    conn = sqlite3.connect("hospital.db", cached_statements=256, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA cache_size=-20000")
+    atexit.register(lambda: conn.execute("PRAGMA optimize"))
+    create_tables(conn)
+    return conn
+
+@st.cache_resource
+def write_lock():
+    """Serializes writes: the shared connection's transaction spans every session thread."""
+    return threading.Lock()
+
+SCHEMA_VERSION = 1
+
+# (table, column, type) added after the table's first release
+COLUMN_MIGRATIONS = [
+    ("users", "specialization", "TEXT"),
+]
+
+def add_column_if_missing(conn, table, column, col_type):
     """Adds a column to an SQLite table if it does not already exist."""
-    c.execute(f"PRAGMA table_info({table})")
-    columns = [info[1] for info in c.fetchall()]
-    if column not in columns:
-        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
-        conn.commit()
+    try:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+    except sqlite3.OperationalError as e:
+        if "duplicate column name" not in str(e):
+            raise
 
-def create_tables():
+def create_tables(conn):
     # Users table
-    c.execute("""CREATE TABLE IF NOT EXISTS users (
+    conn.execute("""CREATE TABLE IF NOT EXISTS users (
                     username TEXT PRIMARY KEY,
                     password BLOB,
                     role TEXT)""")
-    add_column_if_missing("users", "specialization", "TEXT")
+
+    # Column migrations, run once per schema version; a failure leaves the version unbumped
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+    row = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+    if not row or row[0] < SCHEMA_VERSION:
+        for table, column, col_type in COLUMN_MIGRATIONS:
+            add_column_if_missing(conn, table, column, col_type)
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
 
     # Patients
-    c.execute("""CREATE TABLE IF NOT EXISTS patients (
+    conn.execute("""CREATE TABLE IF NOT EXISTS patients (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     name TEXT,
                     age INTEGER,
@@ -37,7 +75,7 @@ def create_tables():
                     address TEXT)""")
 
     # Appointments
-    c.execute("""CREATE TABLE IF NOT EXISTS appointments (
+    conn.execute("""CREATE TABLE IF NOT EXISTS appointments (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     patient_id INTEGER,
                     doctor TEXT,
@@ -45,75 +83,216 @@ def create_tables():
                     status TEXT)""")
 
     # Billing
-    c.execute("""CREATE TABLE IF NOT EXISTS billing (
+    conn.execute("""CREATE TABLE IF NOT EXISTS billing (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     patient_id INTEGER,
                     items TEXT,
                     total REAL)""")
 
+    # Bill line items, normalized from billing.items
+    has_bill_items = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bill_items'").fetchone()
+    conn.execute("""CREATE TABLE IF NOT EXISTS bill_items (
+                    bill_id INTEGER,
+                    name TEXT,
+                    price REAL)""")
+    if not has_bill_items:
+        for bill_id, items in conn.execute("SELECT id, items FROM billing").fetchall():
+            conn.executemany("INSERT INTO bill_items (bill_id, name, price) VALUES (?, ?, ?)",
+                             [(bill_id, name, price) for name, price in _parse_items(items or "")])
+
+    # Indexes for the patient joins and the doctor view
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_appt_patient ON appointments(patient_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_appt_doctor_date ON appointments(doctor, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bill_patient ON billing(patient_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bill_items_bill ON bill_items(bill_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_patients_name ON patients(name)")
+    conn.execute("ANALYZE")
+
     conn.commit()
 
-create_tables()
+# =================== CACHE ===================
+@st.cache_resource
+def table_versions():
+    """Process-wide write counters, shared by every session, used to key cached reads."""
+    return {}
+
+def table_version(table):
+    return table_versions().get(table, 0)
+
+def bump_version(table):
+    """Invalidates cached reads of a table after a write."""
+    versions = table_versions()
+    versions[table] = versions.get(table, 0) + 1
 
 # =================== AUTH ===================
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+
+@st.cache_resource
+def salt_queue():
+    """Salts pre-generated at BCRYPT_ROUNDS by a daemon thread, ready for the next registration."""
+    salts = queue.Queue(maxsize=8)
+
+    def fill():
+        while True:
+            salts.put(bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
+    threading.Thread(target=fill, daemon=True).start()
+    return salts
+
+def next_salt():
+    try:
+        return salt_queue().get_nowait()
+    except queue.Empty:
+        return bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+
 def hash_password(password):
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+    return bcrypt.hashpw(password.encode(), next_salt())
 
 def check_password(password, hashed):
     return bcrypt.checkpw(password.encode(), hashed)
 
 def add_user(username, password, role, specialization=""):
     hashed_pw = hash_password(password)
-    c.execute("INSERT INTO users (username, password, role, specialization) VALUES (?, ?, ?, ?)", 
-              (username, hashed_pw, role, specialization))
-    conn.commit()
+    conn = get_conn()
+    with write_lock(), conn:
+        conn.execute("INSERT INTO users (username, password, role, specialization) VALUES (?, ?, ?, ?)",
+                     (username, hashed_pw, role, specialization))
+
+@st.cache_resource
+def session_secret():
+    """Key for signing session tokens; stable for the life of the server process."""
+    return os.environ.get("HMS_SECRET", "").encode() or secrets.token_bytes(32)
+
+SESSION_TTL = 8 * 3600
+
+def session_token(username, role, expires):
+    """HMAC over the user, role and expiry time."""
+    msg = f"{username}|{role}|{expires}".encode()
+    return hmac.new(session_secret(), msg, "sha256").hexdigest()
+
+def start_session(username, role, specialization):
+    expires = int(time.time()) + SESSION_TTL
+    st.session_state["auth"] = (username, role, specialization, expires, session_token(username, role, expires))
+
+def current_user():
+    """Returns (username, role, specialization) if the session holds a valid, unexpired token."""
+    auth = st.session_state.get("auth")
+    if auth:
+        username, role, specialization, expires, token = auth
+        if expires > time.time() and hmac.compare_digest(token, session_token(username, role, expires)):
+            return username, role, specialization
+        del st.session_state["auth"]
+    return None
+
+LOGIN_CACHE_TTL = 300
+
+@st.cache_resource(show_spinner=False)
+def dummy_hash():
+    """Checked against for unknown users so a miss costs the same bcrypt work as a wrong password."""
+    return bcrypt.hashpw(b"x", bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
+dummy_hash()  # built eagerly so the first unknown-user login also costs one checkpw
+
+@st.cache_resource
+def verified_logins():
+    """(username, sha256(password)) -> (expiry, role, specialization) for recent successful logins."""
+    return {}
 
 def login_user(username, password):
-    c.execute("SELECT password, role, specialization FROM users WHERE username = ?", (username,))
-    result = c.fetchone()
-    if result and check_password(password, result[0]):
+    key = (username, hashlib.sha256(password.encode()).digest())
+    logins = verified_logins()
+    cached = logins.get(key)
+    if cached and cached[0] > time.time():
+        return cached[1], cached[2]
+
+    conn = get_conn()
+    result = conn.execute("SELECT password, role, specialization FROM users WHERE username = ?", (username,)).fetchone()
+    if result is None:
+        check_password(password, dummy_hash())
+        return None, None
+    if check_password(password, result[0]):
+        now = time.time()
+        for stale in [k for k, v in list(logins.items()) if v[0] <= now]:
+            logins.pop(stale, None)
+        logins[key] = (now + LOGIN_CACHE_TTL, result[1], result[2])
         return result[1], result[2]
     return None, None
 
 # =================== PATIENT ===================
 def add_patient(name, age, gender, phone, address):
-    c.execute("INSERT INTO patients (name, age, gender, phone, address) VALUES (?, ?, ?, ?, ?)",
-              (name, age, gender, phone, address))
-    conn.commit()
-
-def get_patients():
-    c.execute("""CREATE TABLE IF NOT EXISTS patients (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT,
-                    age INTEGER,
-                    gender TEXT,
-                    phone TEXT,
-                    address TEXT)""")
-    conn.commit()
-    return pd.read_sql("SELECT * FROM patients", conn)
+    conn = get_conn()
+    with write_lock(), conn:
+        conn.execute("INSERT INTO patients (name, age, gender, phone, address) VALUES (?, ?, ?, ?, ?)",
+                     (name, age, gender, phone, address))
+    bump_version("patients")
+
+PATIENT_COLUMNS = ["name", "age", "gender", "phone", "address"]
+
+def add_patients_bulk(rows):
+    """Inserts (name, age, gender, phone, address) tuples in a single transaction."""
+    conn = get_conn()
+    with write_lock(), conn:
+        conn.executemany("INSERT INTO patients (name, age, gender, phone, address) VALUES (?, ?, ?, ?, ?)", rows)
+    bump_version("patients")
+
+PATIENT_PAGE_SIZE = 50
+
+def get_patients_page(page, n=PATIENT_PAGE_SIZE):
+    return load_patients_page(table_version("patients"), page, n)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_patients_page(version, page, n):
+    """One zero-based page of the patients table, in id order."""
+    conn = get_conn()
+    return pd.read_sql("SELECT * FROM patients ORDER BY id LIMIT ? OFFSET ?", conn, params=(n, page * n))
+
+def get_patient_count():
+    return load_patient_count(table_version("patients"))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_patient_count(version):
+    conn = get_conn()
+    return conn.execute("SELECT COUNT(*) FROM patients").fetchone()[0]
+
+def get_patient_choices():
+    return load_patient_choices(table_version("patients"))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_patient_choices(version):
+    """Only the (id, name) pairs that the patient dropdowns need."""
+    conn = get_conn()
+    return pd.read_sql("SELECT id, name FROM patients ORDER BY name", conn)
+
+def patient_id_for(name):
+    """Returns the id of the first patient with this name, via idx_patients_name."""
+    conn = get_conn()
+    row = conn.execute("SELECT id FROM patients WHERE name = ? ORDER BY id LIMIT 1", (name,)).fetchone()
+    return row[0] if row else None
 
 # =================== APPOINTMENT ===================
 def add_appointment(patient_id, doctor, date, status="Scheduled"):
-    c.execute("INSERT INTO appointments (patient_id, doctor, date, status) VALUES (?, ?, ?, ?)",
-              (patient_id, doctor, date, status))
-    conn.commit()
+    conn = get_conn()
+    with write_lock(), conn:
+        conn.execute("INSERT INTO appointments (patient_id, doctor, date, status) VALUES (?, ?, ?, ?)",
+                     (patient_id, doctor, date, status))
+    bump_version("appointments")
 
 def get_appointments(doctor=None):
-    c.execute("""CREATE TABLE IF NOT EXISTS appointments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    patient_id INTEGER,
-                    doctor TEXT,
-                    date TEXT,
-                    status TEXT)""")
-    conn.commit()
+    return load_appointments(table_version("appointments"), doctor)
 
+@st.cache_data(ttl=60, show_spinner=False)
+def load_appointments(version, doctor=None):
+    conn = get_conn()
+    params = ()
     if doctor:
-        query = f"""
+        query = """
             SELECT a.id, p.name as patient, a.doctor, a.date, a.status
             FROM appointments a
             JOIN patients p ON a.patient_id = p.id
-            WHERE a.doctor = '{doctor}'
+            WHERE a.doctor = ?
         """
+        params = (doctor,)
     else:
         query = """
             SELECT a.id, p.name as patient, a.doctor, a.date, a.status
@@ -121,23 +300,61 @@ def get_appointments(doctor=None):
             JOIN patients p ON a.patient_id = p.id
         """
     try:
-        return pd.read_sql(query, conn)
+        return pd.read_sql(query, conn, params=params)
     except:
         return pd.DataFrame(columns=["id", "patient", "doctor", "date", "status"])
 
+def appt_doctor_status_counts():
+    return load_appt_doctor_status_counts(table_version("appointments"))
+
+@st.cache_data(ttl=30, show_spinner=False)
+def load_appt_doctor_status_counts(version):
+    """Appointment counts per (doctor, status), aggregated in SQLite for the dashboard chart."""
+    conn = get_conn()
+    return pd.read_sql("""
+        SELECT doctor, status, COUNT(*) AS n
+        FROM appointments
+        GROUP BY doctor, status
+    """, conn)
+
+def dashboard_counts():
+    """(patients, appointments) row counts in one round-trip for the metric tiles."""
+    conn = get_conn()
+    return conn.execute("SELECT (SELECT COUNT(*) FROM patients), (SELECT COUNT(*) FROM appointments)").fetchone()
+
 # =================== BILLING ===================
+_ITEM_RE = re.compile(r"^[ \t]*(.*?)[ \t]*-[ \t]*₹?[ \t]*(\d[\d,]*(?:\.\d+)?|\.\d+)[ \t]*$", re.MULTILINE)
+
+def _parse_items(items):
+    """Returns (name, price) for each 'name - ₹price' line; lines without a price are skipped."""
+    return [(m.group(1), float(m.group(2).replace(",", ""))) for m in _ITEM_RE.finditer(items)]
+
+def unpriced_lines(items):
+    """Lines with a '-' whose price can't be parsed, which would otherwise bill as ₹0."""
+    return [line for line in items.split("\n") if "-" in line and not _ITEM_RE.fullmatch(line)]
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def parse_items(items):
+    return _parse_items(items)
+
+def parse_total(items):
+    return sum(price for _, price in parse_items(items))
+
 def add_bill(patient_id, items, total):
-    c.execute("INSERT INTO billing (patient_id, items, total) VALUES (?, ?, ?)",
-              (patient_id, items, total))
-    conn.commit()
+    conn = get_conn()
+    with write_lock(), conn:
+        bill_id = conn.execute("INSERT INTO billing (patient_id, items, total) VALUES (?, ?, ?)",
+                               (patient_id, items, total)).lastrowid
+        conn.executemany("INSERT INTO bill_items (bill_id, name, price) VALUES (?, ?, ?)",
+                         [(bill_id, name, price) for name, price in parse_items(items)])
+    bump_version("billing")
 
 def get_bills():
-    c.execute("""CREATE TABLE IF NOT EXISTS billing (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    patient_id INTEGER,
-                    items TEXT,
-                    total REAL)""")
-    conn.commit()
+    return load_bills(table_version("billing"))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_bills(version):
+    conn = get_conn()
     try:
         return pd.read_sql("""
             SELECT b.id, p.name as patient, b.items, b.total
@@ -148,6 +365,15 @@ def get_bills():
         return pd.DataFrame(columns=["id", "patient", "items", "total"])
 
 # =================== PDF ===================
+def draw_item_lines(p, y, text):
+    """Draws one '- line' per row of text in a single text object; returns the y below it."""
+    lines = text.split("\n")
+    textobj = p.beginText(70, y)
+    textobj.setFont("Helvetica", 12, leading=20)
+    textobj.textLines([f"- {line}" for line in lines])
+    p.drawText(textobj)
+    return y - 20 * len(lines)
+
 def generate_invoice_pdf(patient_name, items, total):
     buffer = BytesIO()
     p = canvas.Canvas(buffer, pagesize=A4)
@@ -155,12 +381,8 @@ def generate_invoice_pdf(patient_name, items, total):
     p.drawString(200, 800, "Hospital Invoice")
     p.setFont("Helvetica", 12)
     p.drawString(50, 770, f"Patient: {patient_name}")
-    y = 740
-    p.drawString(50, y, "Services/Items:")
-    y -= 20
-    for item in items.split("\n"):
-        p.drawString(70, y, f"- {item}")
-        y -= 20
+    p.drawString(50, 740, "Services/Items:")
+    y = draw_item_lines(p, 720, items)
     p.drawString(50, y-10, f"Total: ₹{total}")
     p.showPage()
     p.save()
@@ -175,17 +397,100 @@ def generate_prescription_pdf(patient_name, doctor_name, specialization, medicin
     p.setFont("Helvetica", 12)
     p.drawString(50, 770, f"Doctor: {doctor_name} ({specialization})")
     p.drawString(50, 750, f"Patient: {patient_name}")
-    y = 720
-    p.drawString(50, y, "Medicines:")
-    y -= 20
-    for med in medicines.split("\n"):
-        p.drawString(70, y, f"- {med}")
-        y -= 20
+    p.drawString(50, 720, "Medicines:")
+    draw_item_lines(p, 700, medicines)
     p.showPage()
     p.save()
     buffer.seek(0)
     return buffer
 
+# =================== ADMIN TABS ===================
+def rerun_with_message(message):
+    """Reruns the whole app so every tab sees a write, showing `message` on the next run."""
+    st.session_state["flash"] = message
+    st.rerun()
+
+@st.fragment
+def admin_dashboard_tab():
+    st.subheader("📊 Dashboard")
+    patient_count, appt_count = dashboard_counts()
+    col1, col2 = st.columns(2)
+    col1.metric("Total Patients", patient_count)
+    col2.metric("Appointments", appt_count)
+    counts_df = appt_doctor_status_counts()
+    if not counts_df.empty:
+        fig = px.bar(counts_df, x="doctor", y="n", color="status", title="Appointments per Doctor")
+        st.plotly_chart(fig)
+
+@st.fragment
+def admin_patients_tab():
+    st.subheader("Add Patient")
+    name = st.text_input("Name")
+    age = st.number_input("Age", 1, 120)
+    gender = st.selectbox("Gender", ["Male", "Female", "Other"])
+    phone = st.text_input("Phone")
+    address = st.text_area("Address")
+    if st.button("Save Patient"):
+        add_patient(name, age, gender, phone, address)
+        rerun_with_message("Patient Added")
+    with st.expander("Import patients from CSV"):
+        upload = st.file_uploader(f"CSV with columns: {', '.join(PATIENT_COLUMNS)}", type="csv")
+        if upload is not None and st.button("Import Patients"):
+            try:
+                csv_df = pd.read_csv(upload, dtype={"phone": str})
+            except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+                st.error(f"Could not read CSV: {e}")
+            else:
+                missing = [col for col in PATIENT_COLUMNS if col not in csv_df.columns]
+                if missing:
+                    st.error(f"Missing columns: {', '.join(missing)}")
+                else:
+                    # Non-numeric ages are stored as NULL rather than as text
+                    ages = pd.to_numeric(csv_df["age"], errors="coerce").round().astype("Int64")
+                    csv_df["age"] = ages.astype(object).where(ages.notna(), None)
+                    add_patients_bulk(csv_df[PATIENT_COLUMNS].itertuples(index=False, name=None))
+                    rerun_with_message(f"Imported {len(csv_df)} patients")
+    total = get_patient_count()
+    pages = max(1, -(-total // PATIENT_PAGE_SIZE))
+    page = st.number_input("Page", 1, pages, key="patients_page")
+    page_df = get_patients_page(page - 1)
+    st.dataframe(page_df)
+    first = (page - 1) * PATIENT_PAGE_SIZE
+    st.caption(f"Showing {first + 1 if total else 0}-{first + len(page_df)} of {total} patients")
+
+@st.fragment
+def admin_appointments_tab():
+    st.subheader("Schedule Appointment")
+    choices_df = get_patient_choices()
+    if not choices_df.empty:
+        patient_choice = st.selectbox("Select Patient", choices_df["name"].tolist(), key="admin_patient_select")
+        doctor = st.text_input("Doctor Name")
+        date = st.date_input("Date")
+        if st.button("Book Appointment"):
+            pid = patient_id_for(patient_choice)
+            add_appointment(pid, doctor, str(date))
+            rerun_with_message("Appointment Booked")
+    st.dataframe(get_appointments())
+
+@st.fragment
+def admin_billing_tab():
+    st.subheader("Billing System")
+    choices_df = get_patient_choices()
+    if not choices_df.empty:
+        patient_choice = st.selectbox("Select Patient", choices_df["name"].tolist(), key="admin_billing_select")
+        items = st.text_area("Services/Items (name - ₹price)")
+        total = parse_total(items)
+        st.write(f"**Total: ₹{total}**")
+        bad_lines = unpriced_lines(items)
+        if bad_lines:
+            st.error("Fix the price on these lines (use 'name - ₹price'): " + "; ".join(bad_lines))
+        if st.button("Generate Bill", disabled=bool(bad_lines)):
+            pid = patient_id_for(patient_choice)
+            add_bill(pid, items, total)
+            pdf_buffer = generate_invoice_pdf(patient_choice, items, total)
+            st.download_button("📥 Download Invoice", data=pdf_buffer, file_name="invoice.pdf", mime="application/pdf")
+    st.dataframe(get_bills())
+
 # =================== STREAMLIT ===================
 st.set_page_config(page_title="🏥 Hospital Management System", layout="wide")
 st.title("🏥 Hospital Management System")
@@ -202,107 +507,75 @@ if choice == "Register":
     if role == "Doctor":
         specialization = st.text_input("Specialization (e.g. Cardiologist, Orthopedic)")
     if st.button("Register"):
-        add_user(new_user, new_pass, role, specialization)
+        with st.spinner("Hashing password..."):
+            add_user(new_user, new_pass, role, specialization)
         st.success(f"User {new_user} registered as {role}")
 
 elif choice == "Login":
-    st.subheader("Login")
-    username = st.text_input("Username")
-    password = st.text_input("Password", type="password")
-    if st.button("Login"):
-        role, specialization = login_user(username, password)
-        if role:
-            st.success(f"Welcome {username}! Role: {role}")
-
-            # =================== ADMIN ===================
-            if role == "Admin":
-                tabs = st.tabs(["Dashboard", "Patients", "Appointments", "Billing"])
-                with tabs[0]:
-                    st.subheader("📊 Dashboard")
-                    patients_df = get_patients()
-                    appt_df = get_appointments()
-                    col1, col2 = st.columns(2)
-                    col1.metric("Total Patients", len(patients_df))
-                    col2.metric("Appointments", len(appt_df))
-                    if not appt_df.empty:
-                        fig = px.bar(appt_df, x="doctor", color="status", title="Appointments per Doctor")
-                        st.plotly_chart(fig)
-
-                with tabs[1]:
-                    st.subheader("Add Patient")
-                    name = st.text_input("Name")
-                    age = st.number_input("Age", 1, 120)
-                    gender = st.selectbox("Gender", ["Male", "Female", "Other"])
-                    phone = st.text_input("Phone")
-                    address = st.text_area("Address")
-                    if st.button("Save Patient"):
-                        add_patient(name, age, gender, phone, address)
-                        st.success("Patient Added")
-                    st.dataframe(get_patients())
-
-                with tabs[2]:
-                    st.subheader("Schedule Appointment")
-                    patients_df = get_patients()
-                    if not patients_df.empty:
-                        patient_choice = st.selectbox("Select Patient", patients_df["name"].tolist(), key="admin_patient_select")
-                        doctor = st.text_input("Doctor Name")
-                        date = st.date_input("Date")
-                        if st.button("Book Appointment"):
-                            pid = patients_df[patients_df["name"] == patient_choice]["id"].values[0]
-                            add_appointment(pid, doctor, str(date))
-                            st.success("Appointment Booked")
-                    st.dataframe(get_appointments())
-
-                with tabs[3]:
-                    st.subheader("Billing System")
-                    patients_df = get_patients()
-                    if not patients_df.empty:
-                        patient_choice = st.selectbox("Select Patient", patients_df["name"].tolist(), key="admin_billing_select")
-                        items = st.text_area("Services/Items (name - ₹price)")
-                        if items.strip():
-                            total = sum([float(i.split("-")[-1].strip().replace("₹", "")) if "-" in i else 0 for i in items.split("\n")])
-                        else:
-                            total = 0
-                        st.write(f"**Total: ₹{total}**")
-                        if st.button("Generate Bill"):
-                            pid = patients_df[patients_df["name"] == patient_choice]["id"].values[0]
-                            add_bill(pid, items, total)
-                            pdf_buffer = generate_invoice_pdf(patient_choice, items, total)
-                            st.download_button("📥 Download Invoice", data=pdf_buffer, file_name="invoice.pdf", mime="application/pdf")
-                    st.dataframe(get_bills())
-
-            # =================== DOCTOR ===================
-            elif role == "Doctor":
-                tabs = st.tabs(["My Appointments", "Prescriptions"])
-                with tabs[0]:
-                    st.subheader(f"My Appointments ({specialization})")
-                    st.dataframe(get_appointments(username))
-                with tabs[1]:
-                    patients_df = get_patients()
-                    if not patients_df.empty:
-                        patient_choice = st.selectbox("Select Patient", patients_df["name"].tolist(), key="doctor_prescription_select")
-                        medicines = st.text_area("Medicines (one per line)")
-                        if st.button("Generate Prescription"):
-                            pdf_buffer = generate_prescription_pdf(patient_choice, username, specialization, medicines)
-                            st.download_button("📥 Download Prescription", data=pdf_buffer, file_name="prescription.pdf", mime="application/pdf")
-
-            # =================== RECEPTIONIST ===================
-            elif role == "Receptionist":
-                st.subheader("Book Appointment")
-                patients_df = get_patients()
-                if not patients_df.empty:
-                    patient_choice = st.selectbox("Select Patient", patients_df["name"].tolist(), key="receptionist_patient_select")
-                    doctor = st.text_input("Doctor Name")
-                    date = st.date_input("Date")
-                    if st.button("Book Appointment"):
-                        pid = patients_df[patients_df["name"] == patient_choice]["id"].values[0]
-                        add_appointment(pid, doctor, str(date))
-                        st.success("Appointment Booked")
-                st.dataframe(get_appointments())
-
-            # =================== PATIENT ===================
-            elif role == "Patient":
-                st.subheader("My Bills")
-                st.dataframe(get_bills())
-        else:
-            st.error("Invalid Username or Password")
+    auth = current_user()
+    if auth is None:
+        st.subheader("Login")
+        username = st.text_input("Username")
+        password = st.text_input("Password", type="password")
+        if st.button("Login"):
+            role, specialization = login_user(username, password)
+            if role:
+                start_session(username, role, specialization)
+                st.rerun()
+            else:
+                st.error("Invalid Username or Password")
+
+    if auth:
+        username, role, specialization = auth
+        st.success(f"Welcome {username}! Role: {role}")
+        if st.sidebar.button("Logout"):
+            del st.session_state["auth"]
+            st.rerun()
+
+        # =================== ADMIN ===================
+        if role == "Admin":
+            if "flash" in st.session_state:
+                st.success(st.session_state.pop("flash"))
+            tabs = st.tabs(["Dashboard", "Patients", "Appointments", "Billing"])
+            with tabs[0]:
+                admin_dashboard_tab()
+            with tabs[1]:
+                admin_patients_tab()
+            with tabs[2]:
+                admin_appointments_tab()
+            with tabs[3]:
+                admin_billing_tab()
+
+        # =================== DOCTOR ===================
+        elif role == "Doctor":
+            tabs = st.tabs(["My Appointments", "Prescriptions"])
+            with tabs[0]:
+                st.subheader(f"My Appointments ({specialization})")
+                st.dataframe(get_appointments(username))
+            with tabs[1]:
+                choices_df = get_patient_choices()
+                if not choices_df.empty:
+                    patient_choice = st.selectbox("Select Patient", choices_df["name"].tolist(), key="doctor_prescription_select")
+                    medicines = st.text_area("Medicines (one per line)")
+                    if st.button("Generate Prescription"):
+                        pdf_buffer = generate_prescription_pdf(patient_choice, username, specialization, medicines)
+                        st.download_button("📥 Download Prescription", data=pdf_buffer, file_name="prescription.pdf", mime="application/pdf")
+
+        # =================== RECEPTIONIST ===================
+        elif role == "Receptionist":
+            st.subheader("Book Appointment")
+            choices_df = get_patient_choices()
+            if not choices_df.empty:
+                patient_choice = st.selectbox("Select Patient", choices_df["name"].tolist(), key="receptionist_patient_select")
+                doctor = st.text_input("Doctor Name")
+                date = st.date_input("Date")
+                if st.button("Book Appointment"):
+                    pid = patient_id_for(patient_choice)
+                    add_appointment(pid, doctor, str(date))
+                    st.success("Appointment Booked")
+            st.dataframe(get_appointments())
+
+        # =================== PATIENT ===================
+        elif role == "Patient":
+            st.subheader("My Bills")
+            st.dataframe(get_bills())